@@ -1,19 +1,161 @@
 """Audio generation using MLX Audio for Apple Silicon."""
 
 import sys
+import os
+import contextlib
+import functools
 import json
+import time
+import wave
+
+try:
+    import orjson  # optional, faster result serialization
+except ImportError:
+    orjson = None
+
+
+# Minimum seconds between repeated PROGRESS lines at the same percentage
+PROGRESS_INTERVAL = 0.1
+
+_last_progress = (None, 0.0)
+
+
+def _emit(line: str):
+    """Write one line to stderr with a single unbuffered write."""
+    sys.stderr.flush()  # keep ordering with anything printed via sys.stderr
+    os.write(sys.stderr.fileno(), f"{line}\n".encode())
 
 
 def status_output(message: str):
     """Output status message for Swift to parse."""
-    print(f"STATUS:{message}", file=sys.stderr)
-    sys.stderr.flush()
+    _emit(f"STATUS:{message}")
 
 
 def progress_output(percent: float, message: str):
-    """Output progress for Swift to parse."""
-    print(f"PROGRESS:{percent}:{message}", file=sys.stderr)
-    sys.stderr.flush()
+    """Output progress for Swift to parse (repeats are throttled)."""
+    global _last_progress
+    now = time.monotonic()
+    last_percent, last_time = _last_progress
+    if percent == last_percent and now - last_time < PROGRESS_INTERVAL:
+        return
+    _last_progress = (percent, now)
+    _emit(f"PROGRESS:{percent}:{message}")
+
+
+def result_output(result: dict):
+    """Write the JSON result line for Swift to parse (compact, one write).
+
+    Goes to the process's real stdout even while library output is
+    redirected to stderr.
+    """
+    if orjson is not None:
+        payload = orjson.dumps(result, option=orjson.OPT_APPEND_NEWLINE)
+    else:
+        payload = json.dumps(result, separators=(",", ":")).encode() + b"\n"
+    stdout = sys.__stdout__
+    stdout.flush()
+    stdout.buffer.write(payload)
+    stdout.buffer.flush()
+
+
+@functools.lru_cache(maxsize=None)
+def _pcm16_converter():
+    """Return a compiled float -> int16 PCM conversion, fused into one kernel."""
+    import mlx.core as mx
+
+    def to_pcm16(audio):
+        # Scale in float32 so fp16 model output keeps full int16 resolution,
+        # and round to nearest rather than truncating toward zero
+        scaled = mx.clip(audio.astype(mx.float32), -1.0, 1.0) * 32767
+        return mx.round(scaled).astype(mx.int16)
+
+    # Elementwise only, so one trace serves every chunk length
+    return mx.compile(to_pcm16, shapeless=True)
+
+
+_pcm_scratch = None
+
+
+def _pcm_buffer(num_samples: int):
+    """Return an int16 buffer of num_samples, reusing one allocation across calls."""
+    global _pcm_scratch
+    import numpy as np
+
+    if _pcm_scratch is None or _pcm_scratch.size < num_samples:
+        _pcm_scratch = np.empty(num_samples, dtype=np.int16)
+    return _pcm_scratch[:num_samples]
+
+
+DEFAULT_MODEL = "mlx-community/Kokoro-82M-bf16"
+SAMPLE_RATE = 24000  # Kokoro uses 24kHz
+
+
+def _write_wav(path: str, pcm, sample_rate: int):
+    """Write mono int16 PCM to a WAV file.
+
+    Uses soundfile (libsndfile, listed in requirements.txt) and falls back
+    to the stdlib wave writer in environments that do not have it.
+    """
+    try:
+        import soundfile as sf
+    except ImportError:
+        sf = None
+
+    if sf is not None:
+        # Single C call, no Python-side header bookkeeping
+        sf.write(path, pcm, sample_rate, format="WAV", subtype="PCM_16")
+        return
+
+    with wave.open(path, "w") as wav_file:
+        wav_file.setnchannels(1)  # Mono
+        wav_file.setsampwidth(2)  # 16-bit
+        wav_file.setframerate(sample_rate)
+        # writeframesraw takes the array buffer directly; the header
+        # is patched once on close
+        wav_file.writeframesraw(memoryview(pcm).cast("B"))
+
+
+def load_tts_model(
+    model_name: str = DEFAULT_MODEL,
+    quantize_bits: int | None = None,
+    float16: bool = False,
+):
+    """Load an MLX Audio TTS model with its weights materialized in memory.
+
+    If quantize_bits is set, Linear/Embedding weights are quantized to that
+    many bits (group size 64) to cut weight bandwidth during decoding.
+    float16 casts the published bf16 weights to fp16 (off by default).
+    """
+    import mlx.core as mx
+    import mlx.nn as nn
+    from mlx_audio.tts.utils import load_model
+
+    model = load_model(model_name)
+    if float16:
+        # No fp16 Kokoro checkpoint is published, so cast the bf16 weights
+        model.set_dtype(mx.float16)
+    if quantize_bits:
+        # Only layers whose input dim splits into whole groups can be quantized
+        nn.quantize(
+            model,
+            group_size=64,
+            bits=quantize_bits,
+            class_predicate=lambda _, m: hasattr(m, "to_quantized")
+            and m.weight.shape[-1] % 64 == 0,
+        )
+    # Weights load lazily; materialize them now so the first generate
+    # chunk doesn't pay for the load
+    mx.eval(model.parameters())
+    return model
+
+
+def warm_up(model, voice: str = "af_heart"):
+    """Run a throwaway one-word synthesis so Metal kernels are compiled up front."""
+    import mlx.core as mx
+
+    to_pcm16 = _pcm16_converter()
+    for result in model.generate(text="a", voice=voice, speed=1.0, lang_code="a"):
+        mx.eval(to_pcm16(result.audio))
 
 
 def generate_audio(
@@ -21,7 +163,10 @@ def generate_audio(
     voice: str = "af_heart",
     output_path: str = "output.wav",
     speed: float = 1.0,
-    model_name: str = "mlx-community/Kokoro-82M-bf16",
+    model_name: str = DEFAULT_MODEL,
+    model=None,
+    quantize_bits: int | None = None,
+    float16: bool = False,
 ) -> dict:
     """
     Generate audio from text using MLX Audio.
@@ -32,21 +177,21 @@ def generate_audio(
         output_path: Path to save the output audio file
         speed: Speech speed multiplier (0.5 to 2.0)
         model_name: MLX Audio model to use
+        model: Already-loaded model from load_tts_model (skips loading)
+        quantize_bits: Quantize weights to 4 or 8 bits after loading
+        float16: Cast the model weights to float16 after loading
 
     Returns:
         dict with 'success' and 'audio_path' or 'error'
     """
     try:
-        status_output("Loading MLX Audio...")
-        progress_output(10, "Loading model")
-
-        import mlx.core as mx
         import numpy as np
-        from mlx_audio.tts.utils import load_model
 
-        # Load model
-        model = load_model(model_name)
-        progress_output(30, "Model loaded")
+        if model is None:
+            status_output("Loading MLX Audio...")
+            progress_output(10, "Loading model")
+            model = load_tts_model(model_name, quantize_bits, float16)
+            progress_output(30, "Model loaded")
 
         status_output(f"Generating speech with voice: {voice}")
         progress_output(40, "Generating speech")
@@ -60,31 +205,28 @@ def generate_audio(
             lang_code="a",  # American English
         ):
             audio_chunks.append(result.audio)
-            progress_output(60, "Processing audio")
+        progress_output(70, f"Processed {len(audio_chunks)} chunks")
 
-        # Concatenate audio chunks
-        if audio_chunks:
-            audio = mx.concatenate(audio_chunks, axis=0)
-        else:
+        if not audio_chunks:
             return {"success": False, "error": "No audio generated"}
 
         progress_output(80, "Saving audio")
 
         # Save to WAV file
-        import wave
-
-        # Convert MLX array to numpy
-        audio_np = np.array(audio, dtype=np.float32)
-
-        # Normalize to int16 range
-        audio_int16 = (audio_np * 32767).astype(np.int16)
+        # Quantize each chunk to int16 on the MLX device and copy it into one
+        # preallocated PCM buffer; no concatenate node or float32 numpy copy
+        total_samples = sum(chunk.shape[0] for chunk in audio_chunks)
+        audio_int16 = _pcm_buffer(total_samples)
+        offset = 0
+        to_pcm16 = _pcm16_converter()
+        for chunk in audio_chunks:
+            pcm = to_pcm16(chunk)
+            n = pcm.shape[0]
+            audio_int16[offset : offset + n] = np.asarray(pcm)
+            offset += n
 
         # Write WAV file
-        with wave.open(output_path, "w") as wav_file:
-            wav_file.setnchannels(1)  # Mono
-            wav_file.setsampwidth(2)  # 16-bit
-            wav_file.setframerate(24000)  # Kokoro uses 24kHz
-            wav_file.writeframes(audio_int16.tobytes())
+        _write_wav(output_path, audio_int16, SAMPLE_RATE)
 
         status_output(f"Audio saved to: {output_path}")
         progress_output(100, "Complete")
@@ -103,11 +245,65 @@ def generate_audio(
         return {"success": False, "error": str(e)}
 
 
+def serve(
+    model_name: str = DEFAULT_MODEL,
+    quantize_bits: int | None = None,
+    float16: bool = False,
+) -> int:
+    """
+    Keep the model resident and answer requests from stdin.
+
+    Each stdin line is a JSON object with 'text' and optional 'voice',
+    'output_path' and 'speed'; one JSON result is written per line to stdout.
+    Anything the model code prints goes to stderr so stdout stays JSON only.
+    """
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            status_output("Loading MLX Audio...")
+            model = load_tts_model(model_name, quantize_bits, float16)
+            # Pay kernel compilation once here rather than on the first request
+            status_output("Warming up...")
+            warm_up(model)
+    except ImportError as e:
+        error_msg = f"MLX Audio not installed: {e}. Run: pip install mlx-audio"
+        status_output(f"ERROR: {error_msg}")
+        result_output({"success": False, "error": error_msg})
+        return 1
+    except Exception as e:
+        import traceback
+
+        status_output(f"ERROR: {e}\n{traceback.format_exc()}")
+        result_output({"success": False, "error": str(e)})
+        return 1
+    status_output("READY")
+
+    allowed = {"text", "voice", "output_path", "speed"}
+    # Raw bytes straight to the parser; no text decoding layer
+    for line in sys.stdin.buffer:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = orjson.loads(line) if orjson is not None else json.loads(line)
+            if not isinstance(request, dict) or "text" not in request:
+                raise ValueError("request must be an object with 'text'")
+            unknown = set(request) - allowed
+            if unknown:
+                raise ValueError(f"unknown keys {sorted(unknown)}")
+        except ValueError as e:
+            result = {"success": False, "error": f"Invalid request: {e}"}
+        else:
+            with contextlib.redirect_stdout(sys.stderr):
+                result = generate_audio(model=model, **request)
+        result_output(result)
+    return 0
+
+
 if __name__ == "__main__":
     import argparse
 
     parser = argparse.ArgumentParser(description="Generate audio with MLX Audio")
-    parser.add_argument("--text", "-t", type=str, required=True, help="Text to speak")
+    parser.add_argument("--text", "-t", type=str, help="Text to speak")
     parser.add_argument("--voice", "-v", type=str, default="af_heart", help="Voice ID")
     parser.add_argument(
         "--output", "-o", type=str, default="output.wav", help="Output path"
@@ -117,19 +313,55 @@ if __name__ == "__main__":
         "--model",
         "-m",
         type=str,
-        default="mlx-community/Kokoro-82M-bf16",
+        default=DEFAULT_MODEL,
         help="Model name",
     )
+    parser.add_argument(
+        "--model-path",
+        type=str,
+        default=None,
+        help="Local model directory (skips Hugging Face cache resolution)",
+    )
+    parser.add_argument(
+        "--quantize",
+        type=int,
+        choices=[4, 8],
+        default=None,
+        help="Quantize model weights to 4 or 8 bits after loading",
+    )
+    parser.add_argument(
+        "--fp16",
+        action="store_true",
+        help="Run the model in float16 instead of its bfloat16 weights",
+    )
+    parser.add_argument(
+        "--server",
+        action="store_true",
+        help="Keep the model loaded and read JSON requests from stdin",
+    )
 
     args = parser.parse_args()
 
+    if args.model_path:
+        if not os.path.isdir(args.model_path):
+            parser.error(f"--model-path is not a directory: {args.model_path}")
+        # A local directory loads without resolving the model through the Hub
+        args.model = args.model_path
+
+    if args.server:
+        sys.exit(serve(args.model, args.quantize, args.fp16))
+    if args.text is None:
+        parser.error("--text is required unless --server is given")
+
     result = generate_audio(
         text=args.text,
         voice=args.voice,
         output_path=args.output,
         speed=args.speed,
         model_name=args.model,
+        quantize_bits=args.quantize,
+        float16=args.fp16,
     )
 
-    print(json.dumps(result))
+    result_output(result)
     sys.exit(0 if result["success"] else 1)
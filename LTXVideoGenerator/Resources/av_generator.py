@@ -9,45 +9,429 @@ import sys
 import os
 import argparse
 import json
+import contextlib
+import functools
+import queue
+import shutil
+import subprocess
+import threading
+import time
+import types
+
+from video_encoding import H264_VIDEOTOOLBOX_ARGS
+
+try:
+    import orjson  # optional, faster result serialization
+except ImportError:
+    orjson = None
+
+
+def _emit(line: str):
+    """Write one line to stderr with a single unbuffered write."""
+    sys.stderr.flush()  # keep ordering with anything printed via sys.stderr
+    os.write(sys.stderr.fileno(), f"{line}\n".encode())
 
 
 def status_output(message: str):
     """Output status message for Swift to parse."""
-    print(f"STATUS:{message}", file=sys.stderr)
-    sys.stderr.flush()
+    _emit(f"STATUS:{message}")
 
 
 def progress_output(stage: int, step: int, total_steps: int, message: str = ""):
     """Output progress for Swift to parse."""
-    print(f"STAGE:{stage}:STEP:{step}:{total_steps}:{message}", file=sys.stderr)
-    sys.stderr.flush()
+    _emit(f"STAGE:{stage}:STEP:{step}:{total_steps}:{message}")
+
+
+_stdout_lock = threading.Lock()
+
+
+def result_output(result: dict):
+    """Write the JSON result line for Swift to parse (compact, one write).
+
+    Goes to the process's real stdout even while generation output is
+    redirected, and is serialized so server replies never interleave.
+    """
+    if orjson is not None:
+        payload = orjson.dumps(result, option=orjson.OPT_APPEND_NEWLINE)
+    else:
+        payload = json.dumps(result, separators=(",", ":")).encode() + b"\n"
+    stdout = sys.__stdout__
+    with _stdout_lock:
+        stdout.flush()
+        stdout.buffer.write(payload)
+        stdout.buffer.flush()
+
+
+def _integer(value) -> int:
+    """Parse an int without truncating: 7.9 and true are rejected, 7.0 and "7" are not."""
+    if isinstance(value, bool):
+        raise TypeError(f"must be an integer, got {value!r}")
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError(f"must be an integer, got {value!r}")
+    return int(value)
+
+
+def _multiple_of_64(value) -> int:
+    """argparse type: a positive int divisible by 64."""
+    number = _integer(value)
+    if number <= 0 or number % 64 != 0:
+        raise argparse.ArgumentTypeError(
+            f"must be a positive multiple of 64, got {value}"
+        )
+    return number
+
+
+def _frame_count(value) -> int:
+    """argparse type: a frame count of the form 8n+1."""
+    number = _integer(value)
+    if number < 1 or (number - 1) % 8 != 0:
+        raise argparse.ArgumentTypeError(
+            f"must be 8n+1 (9, 17, 25, ...), got {value}"
+        )
+    return number
+
+
+_TILING_MODES = [
+    "auto",
+    "none",
+    "default",
+    "aggressive",
+    "conservative",
+    "spatial",
+    "temporal",
+]
+
+
+def _tiling(value) -> str:
+    """JSON field type: one of the --tiling choices."""
+    if value not in _TILING_MODES:
+        raise argparse.ArgumentTypeError(
+            f"must be one of {', '.join(_TILING_MODES)}, got {value!r}"
+        )
+    return value
+
+
+def _number(value) -> float:
+    """JSON field type: an int or float (not a bool or string)."""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise TypeError(f"must be a number, got {value!r}")
+    return float(value)
+
+
+def _flag(value) -> bool:
+    """JSON field type: true or false, as for a store_true option."""
+    if not isinstance(value, bool):
+        raise TypeError(f"must be true or false, got {value!r}")
+    return value
+
+
+def _model_dir(value) -> str:
+    """argparse type: an existing local model directory."""
+    if not os.path.isdir(value):
+        raise argparse.ArgumentTypeError(f"is not a directory: {value}")
+    return value
+
+
+# Validators applied to the same fields when they come from JSON requests
+_FIELD_TYPES = {
+    "height": _multiple_of_64,
+    "width": _multiple_of_64,
+    "num_frames": _frame_count,
+    "seed": _integer,
+    "fps": _integer,
+    "image_strength": _number,
+    "tiling": _tiling,
+    "no_audio": _flag,
+    "model_path": _model_dir,
+}
+
+
+class _FFmpegPipeWriter:
+    """cv2.VideoWriter stand-in that streams raw RGB frames into ffmpeg's stdin."""
+
+    def __init__(self, path, fourcc, fps, size):
+        width, height = size
+        cmd = [
+            "ffmpeg",
+            "-y",
+            "-loglevel",
+            "error",
+            "-f",
+            "rawvideo",
+            "-pix_fmt",
+            "rgb24",
+            "-s",
+            f"{width}x{height}",
+            "-r",
+            str(fps),
+            "-i",
+            "-",
+            *H264_VIDEOTOOLBOX_ARGS,  # Apple media engine instead of CPU x264
+            "-pix_fmt",
+            "yuv420p",
+            str(path),
+        ]
+        self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+
+    def isOpened(self):
+        return self._proc.poll() is None
+
+    def write(self, frame):
+        self._proc.stdin.write(frame.data)
+
+    def release(self):
+        self._proc.stdin.close()
+        if self._proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg exited with code {self._proc.returncode}")
+
+
+@contextlib.contextmanager
+def _pipe_frames_to_ffmpeg():
+    """Route generate_av's OpenCV frame writer through an ffmpeg pipe.
+
+    generate_av imports cv2 inside the function, so a stand-in module in
+    sys.modules for the duration of the call replaces its VideoWriter.
+    Frames stay RGB (no per-frame BGR conversion).
+    """
+    shim = types.ModuleType("cv2")
+    shim.VideoWriter = _FFmpegPipeWriter
+    shim.VideoWriter_fourcc = lambda *code: 0
+    shim.cvtColor = lambda frame, code: frame
+    shim.COLOR_RGB2BGR = None
+
+    saved = sys.modules.get("cv2")
+    sys.modules["cv2"] = shim
+    try:
+        yield
+    finally:
+        if saved is not None:
+            sys.modules["cv2"] = saved
+        else:
+            del sys.modules["cv2"]
+
+
+def _binds_cv2_at_import(generate_av) -> bool:
+    """True if generate_av's module imported cv2 at top level, out of the shim's reach."""
+    module = sys.modules.get(generate_av.__module__)
+    return module is not None and "cv2" in vars(module)
+
+
+def _import_generate_av():
+    """Import mlx_video's generate_av (slow: pulls in MLX and the model code)."""
+    import mlx_video.generate_av as generate_av_module
+
+    # Resolving a repo id walks the Hugging Face cache (taking its file lock)
+    # on every call; batch and server modes resolve the same repos each job
+    if not hasattr(generate_av_module.get_model_path, "cache_info"):
+        generate_av_module.get_model_path = functools.lru_cache(maxsize=8)(
+            generate_av_module.get_model_path
+        )
+    return generate_av_module.generate_av
+
+
+def _prefetch_image(path: str):
+    """Check that the source image opens so bad inputs fail early.
+
+    verify() parses the file structure without decoding pixels, so this
+    costs little next to generate_av's own load of the image.
+    """
+    from PIL import Image
+
+    with Image.open(path) as img:
+        img.verify()
+
+
+def _run_generation(generate_av, args: argparse.Namespace) -> dict:
+    """Run one generate_av call for the given arguments and return its JSON result."""
+    is_i2v = args.image is not None
+    mode_str = "I2V" if is_i2v else "T2V"
+    status_output(
+        f"Starting {mode_str} generation with audio: {args.width}x{args.height}, {args.num_frames} frames"
+    )
+
+    # Build generation kwargs
+    gen_kwargs = {
+        "prompt": args.prompt,
+        "height": args.height,
+        "width": args.width,
+        "num_frames": args.num_frames,
+        "seed": args.seed,
+        "fps": args.fps,
+        "model_repo": args.model_path or args.model_repo,
+        "output": args.output_path,
+    }
+
+    # Add image conditioning if provided
+    if args.image:
+        gen_kwargs["image"] = args.image
+        gen_kwargs["image_strength"] = args.image_strength
+        status_output(
+            f"Using source image: {args.image} (strength={args.image_strength})"
+        )
+
+    # Pass tiling mode if supported
+    if args.tiling != "auto":
+        gen_kwargs["tiling"] = args.tiling
+
+    # Disable audio if requested
+    if args.no_audio:
+        gen_kwargs["no_audio"] = True
+        status_output("Audio generation disabled")
+
+    # Pass Gemma prompt enhancement params if non-default
+    if args.repetition_penalty != 1.2:
+        gen_kwargs["repetition_penalty"] = args.repetition_penalty
+    if args.top_p != 0.9:
+        gen_kwargs["top_p"] = args.top_p
+
+    audio_label = "without" if args.no_audio else "with synchronized"
+    status_output(f"Generating video {audio_label} audio...")
+    encode_ctx = contextlib.nullcontext()
+    if args.pipe:
+        if not shutil.which("ffmpeg"):
+            status_output("ffmpeg not found, encoding with OpenCV")
+        elif _binds_cv2_at_import(generate_av):
+            status_output(
+                "WARNING: --pipe ignored: this mlx_video imports cv2 at module level, encoding with OpenCV"
+            )
+        else:
+            encode_ctx = _pipe_frames_to_ffmpeg()
+    with encode_ctx:
+        generate_av(**gen_kwargs)
+
+    status_output(f"Video with audio saved to: {args.output_path}")
+    print("SUCCESS", file=sys.stderr)
+
+    return {
+        "video_path": args.output_path,
+        "seed": args.seed,
+        "mode": "i2v" if is_i2v else "t2v",
+        "has_audio": not args.no_audio,
+    }
+
+
+def _job_from_item(args: argparse.Namespace, item, source: str) -> argparse.Namespace:
+    """Overlay one JSON request object on the command-line arguments."""
+    defaults = vars(args)
+    if not isinstance(item, dict) or not item.get("prompt"):
+        raise ValueError(f"{source}: missing prompt")
+    unknown = set(item) - set(defaults)
+    if unknown:
+        raise ValueError(f"{source}: unknown keys {sorted(unknown)}")
+    for key, field_type in _FIELD_TYPES.items():
+        if key in item:
+            try:
+                item[key] = field_type(item[key])
+            except (argparse.ArgumentTypeError, TypeError, ValueError) as e:
+                raise ValueError(f"{source}: {key} {e}") from None
+    return argparse.Namespace(**{**defaults, **item})
+
+
+def _load_prompt_jobs(args: argparse.Namespace) -> list:
+    """Read a JSONL prompts file into per-prompt argument namespaces.
+
+    Each line is a JSON object whose keys override the command-line
+    arguments (e.g. {"prompt": "...", "output_path": "a.mp4", "seed": 7}).
+    """
+    jobs = []
+    with open(args.prompts_file, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            source = f"{args.prompts_file}:{line_no}"
+            jobs.append(_job_from_item(args, json.loads(line), source))
+    if not jobs:
+        raise ValueError(f"No prompts found in {args.prompts_file}")
+    return jobs
+
+
+def _read_requests(args: argparse.Namespace, jobs: queue.Queue):
+    """Reader thread for _serve: answer pings at once, queue everything else in order."""
+    # Raw bytes straight to the parser; no text decoding layer
+    for line_no, line in enumerate(sys.stdin.buffer, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = orjson.loads(line) if orjson is not None else json.loads(line)
+            if isinstance(item, dict) and item.get("command") == "ping":
+                result_output({"pong": True})
+                continue
+            jobs.put(_job_from_item(args, item, f"request {line_no}"))
+        except ValueError as e:
+            jobs.put(e)
+    jobs.put(None)
+
+
+def _serve(args: argparse.Namespace):
+    """Answer JSON requests from stdin (one per line) in a single long-lived process.
+
+    Requests use the same keys as --prompts-file lines; one JSON result is
+    written per request to stdout. {"command": "ping"} is answered right
+    away, even mid-generation. The process exits when stdin closes.
+    """
+    jobs = queue.Queue()
+    threading.Thread(target=_read_requests, args=(args, jobs), daemon=True).start()
+    # MLX and the model code load on the first job, so READY is immediate
+    status_output("READY")
+    generate_av = None
+    while (job := jobs.get()) is not None:
+        try:
+            if isinstance(job, Exception):
+                raise job
+            if job.image:
+                _prefetch_image(job.image)
+            if generate_av is None:
+                start = time.monotonic()
+                generate_av = _import_generate_av()
+                status_output(f"MLX loaded in {time.monotonic() - start:.1f}s")
+            # Keep generate_av's prints off the result channel
+            with contextlib.redirect_stdout(sys.stderr):
+                result = _run_generation(generate_av, job)
+        except Exception as e:
+            status_output(f"ERROR: {e}")
+            result = {"success": False, "error": str(e)}
+        result_output(result)
 
 
 def main():
     parser = argparse.ArgumentParser(
         description="LTX-2 Unified Audio-Video Generation with MLX"
     )
-    parser.add_argument(
-        "--prompt", "-p", type=str, required=True, help="Text prompt for generation"
+    prompt_group = parser.add_mutually_exclusive_group(required=True)
+    prompt_group.add_argument(
+        "--prompt", "-p", type=str, help="Text prompt for generation"
+    )
+    prompt_group.add_argument(
+        "--prompts-file",
+        type=str,
+        default=None,
+        help="JSONL file of prompts to generate in one process (one JSON object per line)",
+    )
+    prompt_group.add_argument(
+        "--server",
+        action="store_true",
+        help="Stay resident and read JSON requests from stdin (one per line)",
     )
     parser.add_argument(
         "--height",
         "-H",
-        type=int,
+        type=_multiple_of_64,
         default=512,
         help="Output video height (must be divisible by 64)",
     )
     parser.add_argument(
         "--width",
         "-W",
-        type=int,
+        type=_multiple_of_64,
         default=512,
         help="Output video width (must be divisible by 64)",
     )
     parser.add_argument(
         "--num-frames",
         "-n",
-        type=int,
+        type=_frame_count,
         default=65,
         help="Number of frames (should be 8n+1: 9,17,25,33,41,49,57,65,73,81,89,97)",
     )
@@ -64,6 +448,12 @@ def main():
         default="notapalindrome/ltx2-mlx-av",
         help="Model repository ID",
     )
+    parser.add_argument(
+        "--model-path",
+        type=_model_dir,
+        default=None,
+        help="Local model directory (overrides --model-repo, skips Hugging Face cache resolution)",
+    )
     parser.add_argument(
         "--image",
         "-i",
@@ -81,15 +471,7 @@ def main():
         "--tiling",
         type=str,
         default="auto",
-        choices=[
-            "auto",
-            "none",
-            "default",
-            "aggressive",
-            "conservative",
-            "spatial",
-            "temporal",
-        ],
+        choices=_TILING_MODES,
         help="Tiling mode for VAE decoding",
     )
     parser.add_argument(
@@ -110,81 +492,50 @@ def main():
         default=0.9,
         help="Gemma prompt enhancement top-p sampling (0.0-1.0)",
     )
+    parser.add_argument(
+        "--pipe",
+        action="store_true",
+        default=False,
+        help="Encode frames by piping raw RGB to ffmpeg (h264_videotoolbox) instead of OpenCV",
+    )
 
     args = parser.parse_args()
 
     try:
         status_output("Loading unified audio-video model...")
 
-        # Import the mlx-video-with-audio package
-        from mlx_video.generate_av import generate_av
-
-        is_i2v = args.image is not None
-        mode_str = "I2V" if is_i2v else "T2V"
-        status_output(
-            f"Starting {mode_str} generation with audio: {args.width}x{args.height}, {args.num_frames} frames"
-        )
-
-        # Build generation kwargs
-        gen_kwargs = {
-            "prompt": args.prompt,
-            "height": args.height,
-            "width": args.width,
-            "num_frames": args.num_frames,
-            "model_repo": args.model_repo,
-            "output": args.output_path,
-        }
-
-        # Add image conditioning if provided
-        if args.image:
-            gen_kwargs["image"] = args.image
-            gen_kwargs["image_strength"] = args.image_strength
-            status_output(
-                f"Using source image: {args.image} (strength={args.image_strength})"
-            )
-
-        # Pass tiling mode if supported
-        if args.tiling != "auto":
-            gen_kwargs["tiling"] = args.tiling
+        if args.server:
+            _serve(args)
+            return
 
-        # Disable audio if requested
-        if args.no_audio:
-            gen_kwargs["no_audio"] = True
-            status_output("Audio generation disabled")
-
-        # Pass Gemma prompt enhancement params if non-default
-        if args.repetition_penalty != 1.2:
-            gen_kwargs["repetition_penalty"] = args.repetition_penalty
-        if args.top_p != 0.9:
-            gen_kwargs["top_p"] = args.top_p
-
-        audio_label = "without" if args.no_audio else "with synchronized"
-        status_output(f"Generating video {audio_label} audio...")
-        generate_av(**gen_kwargs)
+        if args.prompts_file:
+            jobs = _load_prompt_jobs(args)
+        else:
+            jobs = [args]
 
-        status_output(f"Video with audio saved to: {args.output_path}")
-        print("SUCCESS", file=sys.stderr)
+        # Reject bad source images before paying for the MLX import
+        for image in dict.fromkeys(job.image for job in jobs if job.image):
+            _prefetch_image(image)
+        generate_av = _import_generate_av()
 
-        # Output JSON result for Swift to parse
-        result = {
-            "video_path": args.output_path,
-            "seed": args.seed,
-            "mode": "i2v" if is_i2v else "t2v",
-            "has_audio": not args.no_audio,
-        }
-        print(json.dumps(result))
+        for index, job in enumerate(jobs, start=1):
+            if len(jobs) > 1:
+                status_output(f"Prompt {index}/{len(jobs)}")
+            result = _run_generation(generate_av, job)
+            # Output JSON result for Swift to parse (one line per prompt)
+            result_output(result)
 
     except ImportError as e:
         error_msg = f"mlx-video-with-audio not installed: {e}. Run: pip install git+https://github.com/james-see/mlx-video-with-audio.git"
         status_output(f"ERROR: {error_msg}")
-        print(json.dumps({"success": False, "error": error_msg}))
+        result_output({"success": False, "error": error_msg})
         sys.exit(1)
     except Exception as e:
         import traceback
 
         error_msg = f"{e}\n{traceback.format_exc()}"
         status_output(f"ERROR: {error_msg}")
-        print(json.dumps({"success": False, "error": str(e)}))
+        result_output({"success": False, "error": str(e)})
         sys.exit(1)
 
 
@@ -8,13 +8,23 @@ import sys
 import os
 import argparse
 import json
+import mmap
+import re
+import shutil
+import struct
+import subprocess
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional, Dict
 
 import mlx.core as mx
 import mlx.nn as nn
 import numpy as np
+from mlx.utils import tree_unflatten
+
+from ltx_prompts import ensure_prompts, load_system_prompt
+from video_encoding import H264_VIDEOTOOLBOX_ARGS
 
 # Import internals from mlx_video
 try:
@@ -66,98 +76,249 @@ except ImportError as e:
     sys.exit(1)
 
 
+# Max LoRA layers whose deltas are materialized in one batched matmul
+LORA_BATCH_SIZE = 16
+
+# Diffusers/ComfyUI LoRA module names -> mlx_video module names
+_LORA_KEY_MAP = {
+    ".audio_ff.net.0.proj": ".audio_ff.proj_in",
+    ".audio_ff.net.2": ".audio_ff.proj_out",
+    ".ff.net.0.proj": ".ff.proj_in",
+    ".ff.net.2": ".ff.proj_out",
+    ".to_out.0": ".to_out",
+    ".linear_1": ".linear1",
+    ".linear_2": ".linear2",
+}
+_LORA_PREFIX_RE = re.compile(r"^(?:model\.diffusion_model\.)?(?:transformer\.)?")
+# Each rule must end on a path-segment boundary so it also applies to the
+# final segment of a module name (base names carry no trailing dot)
+_LORA_KEY_RE = re.compile(
+    "|".join(re.escape(k) + r"(?=\.|$)" for k in _LORA_KEY_MAP)
+)
+
+
+# safetensors dtype tag -> (numpy storage dtype, mlx dtype)
+_SAFETENSORS_DTYPES = {
+    "F64": (np.float64, mx.float32),  # no float64 on the GPU; narrow on load
+    "F32": (np.float32, mx.float32),
+    "F16": (np.float16, mx.float16),
+    "BF16": (np.uint16, mx.bfloat16),  # numpy has no bfloat16; reinterpret bits
+    "I64": (np.int64, mx.int64),
+    "I32": (np.int32, mx.int32),
+    "I16": (np.int16, mx.int16),
+    "I8": (np.int8, mx.int8),
+    "U64": (np.uint64, mx.uint64),
+    "U32": (np.uint32, mx.uint32),
+    "U16": (np.uint16, mx.uint16),
+    "U8": (np.uint8, mx.uint8),
+    "BOOL": (np.bool_, mx.bool_),
+}
+
+
+class _SafetensorsReader:
+    """Memory-mapped safetensors reader that copies out only requested tensors.
+
+    mx.load reads every tensor in the file up front; LoRA files can carry
+    extra tensors we never use.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            (header_len,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(header_len))
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header.pop("__metadata__", None)
+        self._header = header
+        self._data_start = 8 + header_len
+
+    def keys(self):
+        return self._header.keys()
+
+    def get_tensor(self, key: str) -> mx.array:
+        info = self._header[key]
+        if info["dtype"] not in _SAFETENSORS_DTYPES:
+            raise ValueError(f"Unsupported safetensors dtype {info['dtype']} for {key}")
+        np_dtype, mx_dtype = _SAFETENSORS_DTYPES[info["dtype"]]
+        start, end = info["data_offsets"]
+        data = np.frombuffer(
+            self._mmap,
+            dtype=np_dtype,
+            count=(end - start) // np.dtype(np_dtype).itemsize,
+            offset=self._data_start + start,
+        ).reshape(info["shape"])
+        tensor = mx.array(data)
+        if info["dtype"] == "BF16":
+            return tensor.view(mx.bfloat16)
+        return tensor.astype(mx_dtype) if tensor.dtype != mx_dtype else tensor
+
+    def close(self):
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# "<module>.lora_down.weight" / "<module>.lora_A.weight" etc.
+_LORA_FACTOR_RE = re.compile(r"^(.*?)\.(lora_down|lora_up|lora_A|lora_B)")
+_LORA_FACTOR_TYPES = {"lora_down": "down", "lora_A": "down", "lora_up": "up", "lora_B": "up"}
+
+
+_LORA_ALPHA_SUFFIXES = (".lora.alpha", ".alpha", ".lora_alpha")
+_LORA_ALPHA_RE = re.compile(
+    r"^(.*?)(" + "|".join(re.escape(s) for s in _LORA_ALPHA_SUFFIXES) + r")$"
+)
+
+
+def _parse_lora_key(key: str) -> Optional[tuple]:
+    """Split a LoRA tensor key into (base module name, "down" | "up"), or None."""
+    if "alpha" in key:
+        return None
+    match = _LORA_FACTOR_RE.match(key)
+    if match is None:
+        return None
+    return match.group(1), _LORA_FACTOR_TYPES[match.group(2)]
+
+
+def _sanitize_lora_key(key: str) -> str:
+    """Map a LoRA module name onto the mlx_video transformer's module path."""
+    key = _LORA_PREFIX_RE.sub("", key, count=1)
+    return _LORA_KEY_RE.sub(lambda m: _LORA_KEY_MAP[m.group(0)], key)
+
+
+@mx.compile
+def _noise_blend(noise, latent, sigma):
+    """Re-noise latents to sigma: noise * sigma + latent * (1 - sigma), fused."""
+    return noise * sigma + latent * (1 - sigma)
+
+
+@mx.compile
+def _masked_noise_blend(noise, latent, denoise_mask, sigma):
+    """Like _noise_blend, but only where denoise_mask allows (conditioned frames keep latent)."""
+    scaled_mask = denoise_mask * sigma
+    return noise * scaled_mask + latent * (1 - scaled_mask)
+
+
+def _stage_noise_blend(noise, latent, denoise_mask, sigma):
+    """Re-noise a conditioned latent, skipping the mask when it is all ones."""
+    if mx.all(denoise_mask == 1).item():
+        return _noise_blend(noise, latent, sigma)
+    return _masked_noise_blend(noise, latent, denoise_mask, sigma)
+
+
+@mx.compile
+def _video_to_uint8(video):
+    """Decoder output (1, C, F, H, W) in [-1, 1] -> (F, H, W, C) uint8 frames, fused."""
+    video = mx.transpose(mx.squeeze(video, axis=0), (1, 2, 3, 0))
+    video = mx.clip((video + 1.0) / 2.0, 0.0, 1.0)
+    return (video * 255).astype(mx.uint8)
+
+
+def _emit(line: str):
+    """Write one line to stderr with a single unbuffered write."""
+    sys.stderr.flush()  # keep ordering with anything printed via sys.stderr
+    os.write(sys.stderr.fileno(), f"{line}\n".encode())
+
 def status_output(message: str):
     """Output status message for Swift to parse."""
-    print(f"STATUS:{message}", file=sys.stderr)
-    sys.stderr.flush()
+    _emit(f"STATUS:{message}")
 
 def progress_output(stage: int, step: int, total_steps: int, message: str = ""):
     """Output progress for Swift to parse."""
-    print(f"STAGE:{stage}:STEP:{step}:{total_steps}:{message}", file=sys.stderr)
-    sys.stderr.flush()
-
-def apply_lora_weights(model: nn.Module, lora_path: str, strength: float = 1.0):
-    """Load and apply LoRA weights to the model."""
-    if not os.path.exists(lora_path):
-        print(f"{Colors.RED}❌ LoRA file not found: {lora_path}{Colors.RESET}", file=sys.stderr)
-        return
+    _emit(f"STAGE:{stage}:STEP:{step}:{total_steps}:{message}")
 
-    print(f"{Colors.MAGENTA}✨ Applying LoRA: {os.path.basename(lora_path)} (strength={strength}){Colors.RESET}", file=sys.stderr)
+class LoRALinear(nn.Module):
+    """Linear layer with an unmerged low-rank residual: base(x) + scale * x·Aᵀ·Bᵀ."""
 
-    try:
-        lora_weights = mx.load(lora_path)
-    except Exception as e:
-        print(f"{Colors.RED}❌ Failed to load LoRA: {e}{Colors.RESET}", file=sys.stderr)
-        return
-
-    # Helper to sanitize keys
-    def sanitize_key(key):
-        # Remove prefixes
-        key = key.replace("model.diffusion_model.", "")
-        if key.startswith("transformer."):
-             key = key.replace("transformer.", "")
+    def __init__(self, base: nn.Module, down: mx.array, up: mx.array, scale: float):
+        super().__init__()
+        # Quantized weights are packed uint32; compute in the scales' dtype
+        if isinstance(base, nn.QuantizedLinear):
+            dtype = base.scales.dtype
+        else:
+            dtype = base.weight.dtype
+        self.base = base
+        self.lora_down = down.astype(dtype)
+        self.lora_up = up.astype(dtype)
+        self.scale = scale
 
-        # Mapping rules
-        key = key.replace(".to_out.0.", ".to_out.")
-        key = key.replace(".ff.net.0.proj.", ".ff.proj_in.")
-        key = key.replace(".ff.net.2.", ".ff.proj_out.")
-        key = key.replace(".audio_ff.net.0.proj.", ".audio_ff.proj_in.")
-        key = key.replace(".audio_ff.net.2.", ".audio_ff.proj_out.")
-        key = key.replace(".linear_1.", ".linear1.")
-        key = key.replace(".linear_2.", ".linear2.")
+    def __call__(self, x):
+        lora_out = (x @ self.lora_down.T) @ self.lora_up.T
+        return self.base(x) + lora_out * self.scale
 
-        return key
 
+def _read_lora_groups(lora_path: str) -> dict:
+    """Read a LoRA file into {mlx module name: {"down", "up"[, "alpha"]}}."""
     # Group weights by target module
     lora_groups = {}
 
-    for key, value in lora_weights.items():
-        if "lora" not in key:
-            continue
+    with _SafetensorsReader(lora_path) as lora_file:
+        # One pass mapping each module to its alpha key (".lora.alpha" wins
+        # over ".alpha", which wins over ".lora_alpha")
+        alpha_keys = {}
+        for key in lora_file.keys():
+            match = _LORA_ALPHA_RE.match(key)
+            if match is None:
+                continue
+            base_name, suffix = match.groups()
+            rank = _LORA_ALPHA_SUFFIXES.index(suffix)
+            if base_name not in alpha_keys or rank < alpha_keys[base_name][1]:
+                alpha_keys[base_name] = (key, rank)
 
-        if "alpha" in key:
-            continue
+        for key in lora_file.keys():
+            parsed = _parse_lora_key(key)
+            if parsed is None:
+                continue
+            base_name, type_ = parsed
 
-        is_down = "lora_down" in key or "lora_A" in key
-        is_up = "lora_up" in key or "lora_B" in key
+            sanitized_base = _sanitize_lora_key(base_name)
 
-        if not (is_down or is_up):
-            continue
+            if sanitized_base not in lora_groups:
+                lora_groups[sanitized_base] = {}
 
-        if "lora_down" in key:
-            base_name = key.split(".lora_down")[0]
-            type_ = "down"
-        elif "lora_up" in key:
-            base_name = key.split(".lora_up")[0]
-            type_ = "up"
-        elif "lora_A" in key:
-            base_name = key.split(".lora_A")[0]
-            type_ = "down"
-        elif "lora_B" in key:
-            base_name = key.split(".lora_B")[0]
-            type_ = "up"
-        else:
-            continue
+            group = lora_groups[sanitized_base]
+            group[type_] = lora_file.get_tensor(key)
 
-        sanitized_base = sanitize_key(base_name)
+            if "alpha" not in group and base_name in alpha_keys:
+                group["alpha"] = lora_file.get_tensor(alpha_keys[base_name][0])
 
-        if sanitized_base not in lora_groups:
-            lora_groups[sanitized_base] = {}
+    return lora_groups
 
-        lora_groups[sanitized_base][type_] = value
 
-        alpha_key_candidates = [
-            f"{base_name}.lora.alpha",
-            f"{base_name}.alpha",
-            f"{base_name}.lora_alpha"
-        ]
-        for ak in alpha_key_candidates:
-            if ak in lora_weights:
-                lora_groups[sanitized_base]["alpha"] = lora_weights[ak]
-                break
+def apply_lora_weights(
+    model: nn.Module, lora_path: str, strength: float = 1.0, mode: str = "fused"
+):
+    """Load and apply LoRA weights to the model.
+
+    mode="fused" merges B·A into the base weights (no per-step cost);
+    mode="residual" wraps each layer in LoRALinear and keeps the base
+    weights untouched. Quantized layers always take the residual path.
+    """
+    if not os.path.exists(lora_path):
+        print(f"{Colors.RED}❌ LoRA file not found: {lora_path}{Colors.RESET}", file=sys.stderr)
+        return
 
-    applied_count = 0
+    if strength == 0:
+        print(f"{Colors.DIM}LoRA strength is 0, skipping {os.path.basename(lora_path)}{Colors.RESET}", file=sys.stderr)
+        return
+
+    print(f"{Colors.MAGENTA}✨ Applying LoRA: {os.path.basename(lora_path)} (strength={strength}){Colors.RESET}", file=sys.stderr)
+
+    # Read only the LoRA factor/alpha tensors instead of the whole file
+    try:
+        lora_groups = _read_lora_groups(lora_path)
+    except Exception as e:
+        print(f"{Colors.RED}❌ Failed to load LoRA: {e}{Colors.RESET}", file=sys.stderr)
+        return
+
+    # Index every submodule by its dotted path once ("transformer_blocks.0.attn1.to_q")
+    modules = dict(model.named_modules())
 
+    # Resolve target layers and their per-layer scale
+    targets = []
+    residual_layers = []
     for module_name, weights in lora_groups.items():
         if "down" not in weights or "up" not in weights:
             continue
@@ -165,31 +326,8 @@ def apply_lora_weights(model: nn.Module, lora_path: str, strength: float = 1.0):
         down = weights["down"]
         up = weights["up"]
 
-        # Find module in model
-        parts = module_name.split('.')
-        curr = model
-        valid_path = True
-
-        for part in parts:
-            if hasattr(curr, part):
-                curr = getattr(curr, part)
-            elif isinstance(curr, dict) and part in curr:
-                curr = curr[part]
-            elif isinstance(curr, dict) and part.isdigit() and int(part) in curr:
-                 curr = curr[int(part)]
-            elif isinstance(curr, list) and part.isdigit():
-                 idx = int(part)
-                 if idx < len(curr):
-                     curr = curr[idx]
-                 else:
-                     valid_path = False; break
-            elif hasattr(curr, "transformer_blocks") and part == "transformer_blocks":
-                 curr = curr.transformer_blocks
-            else:
-                 valid_path = False
-                 break
-
-        if not valid_path or not isinstance(curr, nn.Linear):
+        curr = modules.get(module_name)
+        if not isinstance(curr, (nn.Linear, nn.QuantizedLinear)):
             continue
 
         rank = down.shape[0]
@@ -202,17 +340,128 @@ def apply_lora_weights(model: nn.Module, lora_path: str, strength: float = 1.0):
         else:
             scale = 1.0
 
-        delta = (up @ down) * (scale * strength)
-
-        if delta.dtype != curr.weight.dtype:
-            delta = delta.astype(curr.weight.dtype)
+        if mode == "residual" or isinstance(curr, nn.QuantizedLinear):
+            lora_layer = LoRALinear(curr, down, up, scale * strength)
+            residual_layers.append((module_name, lora_layer))
+            continue
 
-        curr.weight = curr.weight + delta
-        applied_count += 1
+        # Cast to the layer dtype before the matmul so it runs at bf16 width
+        dtype = curr.weight.dtype
+        targets.append((curr, up.astype(dtype), down.astype(dtype), scale * strength))
+
+    # Group layers with the same weight shape and rank so each group's deltas
+    # come from one batched matmul instead of one small graph per layer
+    shape_classes = {}
+    for target in targets:
+        curr, _, down, _ = target
+        key = (tuple(curr.weight.shape), curr.weight.dtype, down.shape[0])
+        shape_classes.setdefault(key, []).append(target)
+
+    if residual_layers:
+        model.update_modules(tree_unflatten(residual_layers))
+
+    applied_count = len(residual_layers)
+    for (_, dtype, _), group in shape_classes.items():
+        # Bound the stacked delta memory for large groups
+        for i in range(0, len(group), LORA_BATCH_SIZE):
+            batch = group[i : i + LORA_BATCH_SIZE]
+            ups = mx.stack([up for _, up, _, _ in batch])
+            downs = mx.stack([down for _, _, down, _ in batch])
+            scales = mx.array([scale for _, _, _, scale in batch], dtype=dtype)
+            deltas = mx.matmul(ups, downs) * scales.reshape(-1, 1, 1)
+
+            for (curr, _, _, _), delta in zip(batch, deltas):
+                curr.weight = curr.weight + delta
+            mx.eval([curr.weight for curr, _, _, _ in batch])
+            applied_count += len(batch)
 
     print(f"{Colors.GREEN}✓ Applied LoRA to {applied_count} layers{Colors.RESET}", file=sys.stderr)
 
 
+def quantize_transformer(transformer: nn.Module, bits: int, group_size: int = 64):
+    """Quantize the Linear layers inside the transformer blocks in place.
+
+    Embedding/projection layers outside the blocks stay in bf16. LoRA
+    applied afterwards uses residual branches on the quantized layers.
+    """
+    nn.quantize(
+        transformer,
+        group_size=group_size,
+        bits=bits,
+        class_predicate=lambda path, m: path.startswith("transformer_blocks.")
+        and isinstance(m, nn.Linear)
+        and m.weight.shape[-1] % group_size == 0,
+    )
+
+
+def quantize_text_encoder(text_encoder: nn.Module, bits: int, group_size: int = 64):
+    """Quantize the Gemma language model inside the text encoder in place.
+
+    The embedding connectors and feature extractor stay in bf16.
+    """
+    nn.quantize(
+        text_encoder.language_model,
+        group_size=group_size,
+        bits=bits,
+        class_predicate=lambda _, m: hasattr(m, "to_quantized")
+        and m.weight.shape[-1] % group_size == 0,
+    )
+
+
+def encode_video(
+    video_np: np.ndarray, path: Path, fps: int, hw_encode: bool = False
+):
+    """Encode (frames, H, W, 3) uint8 RGB frames to H.264.
+
+    Streams the whole contiguous buffer to ffmpeg as rawvideo in one write
+    (RGB->YUV is done by libswscale); falls back to OpenCV frame by frame
+    when ffmpeg is not on PATH or fails. hw_encode uses the Apple media engine
+    (h264_videotoolbox) instead of CPU x264.
+    """
+    h, w = video_np.shape[1], video_np.shape[2]
+
+    if shutil.which("ffmpeg"):
+        cmd = [
+            "ffmpeg",
+            "-y",
+            "-loglevel",
+            "error",
+            "-f",
+            "rawvideo",
+            "-pix_fmt",
+            "rgb24",
+            "-s",
+            f"{w}x{h}",
+            "-r",
+            str(fps),
+            "-i",
+            "-",
+        ]
+        if hw_encode:
+            cmd += H264_VIDEOTOOLBOX_ARGS
+        else:
+            cmd += ["-c:v", "libx264", "-preset", "veryfast", "-crf", "18"]
+        cmd += ["-pix_fmt", "yuv420p", str(path)]
+        frames = np.ascontiguousarray(video_np)
+        result = subprocess.run(
+            cmd, input=memoryview(frames).cast("B"), capture_output=True
+        )
+        if result.returncode == 0:
+            return
+        stderr = result.stderr.decode(errors="replace").strip()
+        print(
+            f"{Colors.YELLOW}⚠️  ffmpeg failed ({stderr}), encoding with OpenCV{Colors.RESET}",
+            file=sys.stderr,
+        )
+
+    import cv2
+    fourcc = cv2.VideoWriter_fourcc(*"avc1")
+    out = cv2.VideoWriter(str(path), fourcc, fps, (w, h))
+    for frame in video_np:
+        out.write(cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
+    out.release()
+
+
 def generate_video_with_audio_lora(
     model_repo: str,
     text_encoder_repo: Optional[str],
@@ -236,6 +485,10 @@ def generate_video_with_audio_lora(
     tiling: str = "auto",
     lora_path: Optional[str] = None,
     lora_strength: float = 1.0,
+    lora_mode: str = "fused",
+    transformer_bits: Optional[int] = None,
+    text_encoder_bits: Optional[int] = None,
+    hw_encode: bool = False,
 ):
     """Generate video with synchronized audio from text prompt, optionally conditioned on an image and LoRA."""
     start_time = time.time()
@@ -307,6 +560,11 @@ def generate_video_with_audio_lora(
         text_encoder_path=text_encoder_path,
         use_unified=use_unified,
     )
+    if text_encoder_bits:
+        print(
+            f"{Colors.DIM}Quantizing text encoder to {text_encoder_bits}-bit{Colors.RESET}"
+        )
+        quantize_text_encoder(text_encoder, text_encoder_bits)
     mx.eval(text_encoder.parameters())
 
     # Optionally enhance prompt
@@ -317,12 +575,12 @@ def generate_video_with_audio_lora(
             print(f"{Colors.MAGENTA}✨ Enhancing prompt (uncensored)...{Colors.RESET}")
             system_prompt = None
             if is_i2v:
-                from mlx_video.models.ltx.enhance_prompt import _load_system_prompt
-                # Fix: Look for prompt in script dir or resources
+                # Install the prompts bundled next to this script if mlx_video lacks them
                 try:
-                    system_prompt = _load_system_prompt("gemma_i2v_system_prompt.txt")
-                except:
-                     pass # Fallback to default
+                    ensure_prompts()
+                    system_prompt = load_system_prompt("gemma_i2v_system_prompt.txt")
+                except Exception:
+                    pass  # Fallback to default
             prompt = enhance_with_model(
                 prompt,
                 system_prompt=system_prompt,
@@ -361,10 +619,13 @@ def generate_video_with_audio_lora(
     else:
         raw_weights = mx.load(str(model_path / "ltx-2-19b-distilled.safetensors"))
         sanitized = sanitize_transformer_weights(raw_weights)
-        sanitized = {
-            k: v.astype(mx.bfloat16) if v.dtype == mx.float32 else v
-            for k, v in sanitized.items()
-        }
+        del raw_weights
+        # Cast fp32 tensors one at a time so each fp32 buffer is freed as
+        # soon as its bf16 copy exists, rather than holding both full models
+        for k, v in sanitized.items():
+            if v.dtype == mx.float32:
+                sanitized[k] = v.astype(mx.bfloat16)
+                mx.eval(sanitized[k])
 
     config = LTXModelConfig(
         model_type=LTXModelType.AudioVideo,
@@ -392,14 +653,15 @@ def generate_video_with_audio_lora(
     transformer = LTXModel(config)
     transformer.load_weights(list(sanitized.items()), strict=False)
 
-    # --- APPLY LORA HERE ---
-    if lora_path:
-        apply_lora_weights(transformer, lora_path, lora_strength)
-    # -----------------------
-
-    mx.eval(transformer.parameters())
+    if transformer_bits:
+        print(
+            f"{Colors.DIM}Quantizing transformer blocks to {transformer_bits}-bit{Colors.RESET}"
+        )
+        quantize_transformer(transformer, transformer_bits)
 
-    # Load VAE encoder and encode image for I2V conditioning
+    # Load VAE encoder and encode image for I2V conditioning. The encode is
+    # queued on its own GPU stream so it runs alongside the LoRA update
+    # and transformer materialization below
     stage1_image_latent = None
     stage2_image_latent = None
     if is_i2v:
@@ -416,24 +678,41 @@ def generate_video_with_audio_lora(
         )
         mx.eval(vae_encoder.parameters())
 
-        input_image = load_image(
-            image, height=height // 2, width=width // 2, dtype=model_dtype
-        )
-        stage1_image_tensor = prepare_image_for_encoding(
-            input_image, height // 2, width // 2, dtype=model_dtype
-        )
-        stage1_image_latent = vae_encoder(stage1_image_tensor)
-        mx.eval(stage1_image_latent)
+        with mx.stream(mx.new_stream(mx.gpu)):
+            # Decode and resample the file once at full resolution; the stage-1
+            # image is a 2x2 box downscale of it on the GPU, averaged in
+            # float32 so the bf16 input does not lose precision in the sum
+            input_image = load_image(
+                image, height=height, width=width, dtype=model_dtype
+            )
+            half_image = (
+                input_image.astype(mx.float32)
+                .reshape(height // 2, 2, width // 2, 2, 3)
+                .mean(axis=(1, 3))
+                .astype(model_dtype)
+            )
+            stage1_image_tensor = prepare_image_for_encoding(
+                half_image, height // 2, width // 2, dtype=model_dtype
+            )
+            stage1_image_latent = vae_encoder(stage1_image_tensor)
 
-        input_image = load_image(image, height=height, width=width, dtype=model_dtype)
-        stage2_image_tensor = prepare_image_for_encoding(
-            input_image, height, width, dtype=model_dtype
-        )
-        stage2_image_latent = vae_encoder(stage2_image_tensor)
-        mx.eval(stage2_image_latent)
+            stage2_image_tensor = prepare_image_for_encoding(
+                input_image, height, width, dtype=model_dtype
+            )
+            stage2_image_latent = vae_encoder(stage2_image_tensor)
+            mx.async_eval(stage1_image_latent, stage2_image_latent)
 
+    # --- APPLY LORA HERE ---
+    if lora_path and lora_strength != 0:
+        apply_lora_weights(transformer, lora_path, lora_strength, lora_mode)
+    # -----------------------
+
+    if is_i2v:
+        mx.eval(transformer.parameters(), stage1_image_latent, stage2_image_latent)
         del vae_encoder
         mx.clear_cache()
+    else:
+        mx.eval(transformer.parameters())
 
     # Initialize latents
     print(
@@ -462,24 +741,24 @@ def generate_video_with_audio_lora(
         )
         video_state1 = apply_conditioning(video_state1, [conditioning])
 
-        noise = mx.random.normal(video_latent_shape).astype(model_dtype)
+        noise = mx.random.normal(video_latent_shape, dtype=model_dtype)
         noise_scale = mx.array(STAGE_1_SIGMAS[0], dtype=model_dtype)  # 1.0
-        scaled_mask = video_state1.denoise_mask * noise_scale
         video_state1 = LatentState(
-            latent=noise * scaled_mask
-            + video_state1.latent * (mx.array(1.0, dtype=model_dtype) - scaled_mask),
+            latent=_stage_noise_blend(
+                noise, video_state1.latent, video_state1.denoise_mask, noise_scale
+            ),
             clean_latent=video_state1.clean_latent,
             denoise_mask=video_state1.denoise_mask,
         )
         video_latents = video_state1.latent
         mx.eval(video_latents)
     else:
-        video_latents = mx.random.normal(video_latent_shape).astype(model_dtype)
+        video_latents = mx.random.normal(video_latent_shape, dtype=model_dtype)
         mx.eval(video_latents)
 
     audio_latents = mx.random.normal(
-        (1, AUDIO_LATENT_CHANNELS, audio_frames, AUDIO_MEL_BINS)
-    ).astype(model_dtype)
+        (1, AUDIO_LATENT_CHANNELS, audio_frames, AUDIO_MEL_BINS), dtype=model_dtype
+    )
     mx.eval(audio_latents)
 
     # Stage 1 denoising
@@ -550,29 +829,27 @@ def generate_video_with_audio_lora(
         )
         video_state2 = apply_conditioning(video_state2, [conditioning])
 
-        video_noise = mx.random.normal(video_latents.shape).astype(model_dtype)
+        video_noise = mx.random.normal(video_latents.shape, dtype=model_dtype)
         noise_scale = mx.array(STAGE_2_SIGMAS[0], dtype=model_dtype)
-        scaled_mask = video_state2.denoise_mask * noise_scale
         video_state2 = LatentState(
-            latent=video_noise * scaled_mask
-            + video_state2.latent * (mx.array(1.0, dtype=model_dtype) - scaled_mask),
+            latent=_stage_noise_blend(
+                video_noise, video_state2.latent, video_state2.denoise_mask, noise_scale
+            ),
             clean_latent=video_state2.clean_latent,
             denoise_mask=video_state2.denoise_mask,
         )
         video_latents = video_state2.latent
         mx.eval(video_latents)
 
-        audio_noise = mx.random.normal(audio_latents.shape).astype(model_dtype)
-        one_minus_scale = mx.array(1.0, dtype=model_dtype) - noise_scale
-        audio_latents = audio_noise * noise_scale + audio_latents * one_minus_scale
+        audio_noise = mx.random.normal(audio_latents.shape, dtype=model_dtype)
+        audio_latents = _noise_blend(audio_noise, audio_latents, noise_scale)
         mx.eval(audio_latents)
     else:
         noise_scale = mx.array(STAGE_2_SIGMAS[0], dtype=model_dtype)
-        one_minus_scale = mx.array(1.0, dtype=model_dtype) - noise_scale
-        video_noise = mx.random.normal(video_latents.shape).astype(model_dtype)
-        audio_noise = mx.random.normal(audio_latents.shape).astype(model_dtype)
-        video_latents = video_noise * noise_scale + video_latents * one_minus_scale
-        audio_latents = audio_noise * noise_scale + audio_latents * one_minus_scale
+        video_noise = mx.random.normal(video_latents.shape, dtype=model_dtype)
+        audio_noise = mx.random.normal(audio_latents.shape, dtype=model_dtype)
+        video_latents = _noise_blend(video_noise, video_latents, noise_scale)
+        audio_latents = _noise_blend(audio_noise, audio_latents, noise_scale)
         mx.eval(video_latents, audio_latents)
 
     video_latents, audio_latents = denoise_av(
@@ -620,11 +897,12 @@ def generate_video_with_audio_lora(
         video = vae_decoder(video_latents)
     mx.eval(video)
 
-    video = mx.squeeze(video, axis=0)
-    video = mx.transpose(video, (1, 2, 3, 0))
-    video = mx.clip((video + 1.0) / 2.0, 0.0, 1.0)
-    video = (video * 255).astype(mx.uint8)
-    video_np = np.array(video)
+    # The decoder (loaded once, before upsampling) is not needed for audio
+    del vae_decoder
+    mx.clear_cache()
+
+    video = _video_to_uint8(video)
+    mx.eval(video)
 
     # Decode audio
     print(f"{Colors.BLUE}🔊 Decoding audio...{Colors.RESET}")
@@ -633,31 +911,31 @@ def generate_video_with_audio_lora(
     mx.eval(audio_decoder.parameters(), vocoder.parameters())
 
     mel_spectrogram = audio_decoder(audio_latents)
-    mx.eval(mel_spectrogram)
-
     audio_waveform = vocoder(mel_spectrogram)
-    mx.eval(audio_waveform)
-
-    audio_np = np.array(audio_waveform)
-    if audio_np.ndim == 3:
-        audio_np = audio_np[0]
-
-    del audio_decoder, vocoder, vae_decoder
-    mx.clear_cache()
+    # Run audio decoding on the GPU while the CPU copies the frames out
+    mx.async_eval(audio_waveform)
+    video_np = np.array(video)
+    del video
 
     output_path = Path(output_path)
     output_path.parent.mkdir(parents=True, exist_ok=True)
 
     temp_video_path = output_path.with_suffix(".temp.mp4")
 
+    # Encode H.264 on a worker thread (ffmpeg runs out of process) while
+    # the GPU is still decoding audio
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        encoding = pool.submit(encode_video, video_np, temp_video_path, fps, hw_encode)
+
+        audio_np = np.array(audio_waveform)
+        if audio_np.ndim == 3:
+            audio_np = audio_np[0]
+
+        del audio_decoder, vocoder
+        mx.clear_cache()
+
     try:
-        import cv2
-        h, w = video_np.shape[1], video_np.shape[2]
-        fourcc = cv2.VideoWriter_fourcc(*"avc1")
-        out = cv2.VideoWriter(str(temp_video_path), fourcc, fps, (w, h))
-        for frame in video_np:
-            out.write(cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
-        out.release()
+        encoding.result()
     except Exception as e:
         print(f"{Colors.RED}❌ Video encoding failed: {e}{Colors.RESET}")
         return None, None
@@ -797,6 +1075,32 @@ def main():
         default=1.0,
         help="Strength of LoRA (default: 1.0)",
     )
+    parser.add_argument(
+        "--quantize-transformer",
+        type=int,
+        choices=[4, 8],
+        default=None,
+        help="Quantize transformer block weights to 4 or 8 bits at load time",
+    )
+    parser.add_argument(
+        "--quantize-text-encoder",
+        type=int,
+        choices=[4, 8],
+        default=None,
+        help="Quantize the Gemma text encoder weights to 4 or 8 bits at load time",
+    )
+    parser.add_argument(
+        "--hw-encode",
+        action="store_true",
+        help="Encode H.264 on the Apple media engine (h264_videotoolbox) instead of x264",
+    )
+    parser.add_argument(
+        "--lora-mode",
+        type=str,
+        default="fused",
+        choices=["fused", "residual"],
+        help="Merge LoRA into the weights (fused) or keep it as a residual branch",
+    )
 
     # Enhancement args
     parser.add_argument(
@@ -840,7 +1144,7 @@ def main():
         audio_label = "without" if args.no_audio else "with synchronized"
         status_output(f"Generating video {audio_label} audio...")
 
-        generate_video_with_audio_lora(
+        video_np, _ = generate_video_with_audio_lora(
             model_repo=args.model_repo,
             text_encoder_repo=None,
             prompt=args.prompt,
@@ -861,7 +1165,13 @@ def main():
             tiling=args.tiling,
             lora_path=args.lora,
             lora_strength=args.lora_strength,
+            lora_mode=args.lora_mode,
+            transformer_bits=args.quantize_transformer,
+            text_encoder_bits=args.quantize_text_encoder,
+            hw_encode=args.hw_encode,
         )
+        if video_np is None:
+            raise RuntimeError("Video encoding failed")
 
         status_output(f"Video with audio saved to: {args.output_path}")
         print("SUCCESS", file=sys.stderr)
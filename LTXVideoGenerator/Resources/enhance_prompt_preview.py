@@ -10,10 +10,17 @@ Always uses MLX uncensored Gemma via mlx_lm (~7GB, no Lightricks/LTX-2 download)
 """
 
 import argparse
+import functools
 import json
 import re
 import sys
-from pathlib import Path
+
+from ltx_prompts import ensure_prompts, load_system_prompt
+
+try:
+    import orjson  # optional, faster request/result (de)serialization
+except ImportError:
+    orjson = None
 
 ENHANCER_MODEL = "TheCluster/amoral-gemma-3-12B-v2-mlx-4bit"
 
@@ -63,11 +70,36 @@ def _apply_chat_template(system_prompt: str, user_content: str) -> str:
     return formatted
 
 
+# Leading punctuation/emoji (and the space after it) the model sometimes emits.
+# Underscores are kept so a response starting with a __X0__ placeholder survives.
+_LEADING_JUNK_RE = re.compile(r"^[^\w\s]+\s*")
+
+
 def _clean_response(response: str) -> str:
     """Clean up the generated response."""
-    response = response.strip()
-    response = re.sub(r"^[^\w\s]+", "", response)
-    return response.strip()
+    return _LEADING_JUNK_RE.sub("", response.strip())
+
+
+@functools.lru_cache(maxsize=1)
+def _load_enhancer(model_repo: str):
+    """Load (model, tokenizer) once per process; repeat calls reuse the resident weights."""
+    from mlx_lm import load
+
+    print(
+        f"Loading prompt enhancer ({model_repo}, first run ~7GB)...",
+        file=sys.stderr,
+        flush=True,
+    )
+    return load(model_repo)
+
+
+def _unload_enhancer():
+    """Drop the cached enhancer so its weights can be freed."""
+    if _load_enhancer.cache_info().currsize:
+        _load_enhancer.cache_clear()
+        import mlx.core as mx
+
+        mx.clear_cache()
 
 
 def _enhance_with_mlx_lm(
@@ -81,24 +113,17 @@ def _enhance_with_mlx_lm(
 ) -> str:
     """Enhance prompt using mlx_lm with given MLX model. No Lightricks/LTX-2 download."""
     try:
-        from mlx_lm import load, generate
+        from mlx_lm import generate
         from mlx_lm.sample_utils import make_sampler
     except ImportError:
         print("mlx-lm not available. Install: pip install mlx-lm", file=sys.stderr)
         return prompt
 
-    print(
-        f"Loading prompt enhancer ({model_repo}, first run ~7GB)...",
-        file=sys.stderr,
-        flush=True,
-    )
-    model, tokenizer = load(model_repo)
+    model, tokenizer = _load_enhancer(model_repo)
 
     if system_prompt is None:
         try:
-            from mlx_video.models.ltx.enhance_prompt import _load_system_prompt
-
-            system_prompt = _load_system_prompt("gemma_t2v_system_prompt.txt")
+            system_prompt = load_system_prompt("gemma_t2v_system_prompt.txt")
         except Exception:
             system_prompt = "You are a creative writer. Expand the user's short video prompt into a detailed, vivid description suitable for AI video generation. Include lighting, camera movement, and atmosphere."
 
@@ -120,14 +145,118 @@ def _enhance_with_mlx_lm(
         verbose=verbose,
     )
 
-    del model
-    mx.clear_cache()
     return _clean_response(response)
 
 
+def _preview(prompt: str, image: str | None, temperature: float, seed: int) -> dict:
+    """Enhance one prompt, retrying with placeholders if the result comes back empty."""
+    # Always use MLX uncensored Gemma via mlx_lm
+    model_repo = ENHANCER_MODEL
+
+    system_prompt = None
+    if image:
+        try:
+            system_prompt = load_system_prompt("gemma_i2v_system_prompt.txt")
+        except Exception:
+            pass
+
+    def do_enhance(p: str):
+        return _enhance_with_mlx_lm(
+            p,
+            model_repo=model_repo,
+            system_prompt=system_prompt,
+            temperature=temperature,
+            seed=seed,
+            max_tokens=256,
+            verbose=False,
+        )
+
+    enhanced = do_enhance(prompt)
+
+    # Auto-retry with sanitized prompt when enhancement returns empty (filtered)
+    if not enhanced or not enhanced.strip():
+        sanitized, replacements = _sanitize_prompt(prompt)
+        if replacements:
+            enhanced = do_enhance(sanitized)
+            if enhanced and enhanced.strip():
+                enhanced = _merge_back(enhanced, replacements)
+
+    return {"enhanced_prompt": enhanced or ""}
+
+
+def _integer(value) -> int:
+    """Parse an int without truncating: 7.9 and true are rejected, 7.0 and "7" are not."""
+    if isinstance(value, bool):
+        raise TypeError(f"must be an integer, got {value!r}")
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError(f"must be an integer, got {value!r}")
+    return int(value)
+
+
+def _write_result(result: dict):
+    """Write one JSON result line to stdout in a single write."""
+    if orjson is not None:
+        payload = orjson.dumps(result, option=orjson.OPT_APPEND_NEWLINE)
+    else:
+        payload = json.dumps(result, separators=(",", ":")).encode() + b"\n"
+    sys.stdout.buffer.write(payload)
+    sys.stdout.buffer.flush()
+
+
+def _serve(args: argparse.Namespace):
+    """Answer enhance requests from stdin (one JSON object per line) with the model kept loaded.
+
+    Each request has 'prompt' and optional 'image', 'temperature' and 'seed'
+    (defaulting to the CLI values); one JSON result is written per line to stdout.
+    A request with a 'prompts' list instead enhances each prompt in turn with
+    the same settings and returns {"enhanced_prompts": [...]}.
+    {"command": "unload"} frees the resident model, e.g. before a generation
+    that needs the memory; the next request loads it again.
+    """
+    print("STATUS:READY", file=sys.stderr, flush=True)
+    for line in sys.stdin.buffer:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = orjson.loads(line) if orjson is not None else json.loads(line)
+            if isinstance(request, dict) and request.get("command") == "unload":
+                _unload_enhancer()
+                _write_result({"unloaded": True})
+                continue
+            if not isinstance(request, dict):
+                raise ValueError("request must be an object with 'prompt' or 'prompts'")
+            prompts = request.get("prompts")
+            if isinstance(prompts, list):
+                if not all(isinstance(p, str) for p in prompts):
+                    raise ValueError("'prompts' must be a list of strings")
+            elif "prompt" not in request:
+                raise ValueError("request must be an object with 'prompt' or 'prompts'")
+            try:
+                seed = _integer(request.get("seed", args.seed))
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"seed {e}") from None
+            options = {
+                "image": request.get("image"),
+                "temperature": float(request.get("temperature", args.temperature)),
+                "seed": seed,
+            }
+            if isinstance(prompts, list):
+                result = {
+                    "enhanced_prompts": [
+                        _preview(p, **options)["enhanced_prompt"] for p in prompts
+                    ]
+                }
+            else:
+                result = _preview(request["prompt"], **options)
+        except Exception as e:
+            result = {"error": str(e)}
+        _write_result(result)
+
+
 def main():
     parser = argparse.ArgumentParser(description="Preview Gemma-enhanced prompt")
-    parser.add_argument("--prompt", "-p", required=True, help="User prompt to enhance")
+    parser.add_argument("--prompt", "-p", help="User prompt to enhance")
     parser.add_argument(
         "--model-repo",
         default="notapalindrome/ltx2-mlx-av",
@@ -150,66 +279,29 @@ def main():
         help="App Resources path for bundled prompts (pre-flight injection)",
     )
     parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument(
+        "--server",
+        action="store_true",
+        help="Keep the enhancer loaded and read JSON requests from stdin",
+    )
     args = parser.parse_args()
+    if not args.server and args.prompt is None:
+        parser.error("--prompt is required unless --server is given")
 
     try:
         # Pre-flight: inject bundled prompts if mlx_video is missing them
         if args.resources_path:
             try:
-                from pathlib import Path as P
-                import shutil
-
-                resources_path = P(args.resources_path)
-                bundled_prompts = resources_path / "prompts"
-                import mlx_video.models.ltx.text_encoder as te
-
-                target_dir = P(te.__file__).parent / "prompts"
-                for name in [
-                    "gemma_t2v_system_prompt.txt",
-                    "gemma_i2v_system_prompt.txt",
-                ]:
-                    src = bundled_prompts / name
-                    dst = target_dir / name
-                    if src.exists() and not dst.exists():
-                        target_dir.mkdir(parents=True, exist_ok=True)
-                        shutil.copy2(src, dst)
+                ensure_prompts(args.resources_path)
             except Exception:
                 pass
 
-        # Always use MLX uncensored Gemma via mlx_lm
-        model_repo = ENHANCER_MODEL
-
-        system_prompt = None
-        if args.image:
-            try:
-                from mlx_video.models.ltx.enhance_prompt import _load_system_prompt
-
-                system_prompt = _load_system_prompt("gemma_i2v_system_prompt.txt")
-            except Exception:
-                pass
+        if args.server:
+            _serve(args)
+            return
 
-        def do_enhance(p: str):
-            return _enhance_with_mlx_lm(
-                p,
-                model_repo=model_repo,
-                system_prompt=system_prompt,
-                temperature=args.temperature,
-                seed=args.seed,
-                max_tokens=256,
-                verbose=False,
-            )
-
-        enhanced = do_enhance(args.prompt)
-
-        # Auto-retry with sanitized prompt when enhancement returns empty (filtered)
-        if not enhanced or not enhanced.strip():
-            sanitized, replacements = _sanitize_prompt(args.prompt)
-            if replacements:
-                enhanced = do_enhance(sanitized)
-                if enhanced and enhanced.strip():
-                    enhanced = _merge_back(enhanced, replacements)
-
-        print(json.dumps({"enhanced_prompt": enhanced or ""}))
+        result = _preview(args.prompt, args.image, args.temperature, args.seed)
+        print(json.dumps(result))
 
     except Exception as e:
         print(json.dumps({"error": str(e)}), file=sys.stderr)
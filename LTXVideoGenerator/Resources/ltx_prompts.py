@@ -0,0 +1,49 @@
+"""Gemma system prompts shared by the enhance and generation scripts.
+
+Older mlx_video installs ship without the prompt files; the app bundles
+copies under Resources/prompts and installs them on first use.
+"""
+
+import functools
+from pathlib import Path
+
+PROMPT_FILES = ["gemma_t2v_system_prompt.txt", "gemma_i2v_system_prompt.txt"]
+
+
+@functools.lru_cache(maxsize=1)
+def ensure_prompts(resources_path: str | None = None):
+    """Copy the bundled system prompts into mlx_video if they are missing.
+
+    mlx_video is located without importing it, and a sentinel file marks a
+    complete install so later runs stop after a single stat. Repeat calls
+    in one process return immediately.
+    """
+    import importlib.util
+
+    spec = importlib.util.find_spec("mlx_video")
+    if spec is None or not spec.submodule_search_locations:
+        return
+    target_dir = Path(spec.submodule_search_locations[0]) / "models" / "ltx" / "prompts"
+    sentinel = target_dir / ".ltx_prompts_installed"
+    if sentinel.exists():
+        return
+
+    import shutil
+
+    bundled_prompts = Path(resources_path or Path(__file__).parent) / "prompts"
+    for name in PROMPT_FILES:
+        src = bundled_prompts / name
+        dst = target_dir / name
+        if src.exists() and not dst.exists():
+            target_dir.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(src, dst)
+    if all((target_dir / name).exists() for name in PROMPT_FILES):
+        sentinel.touch()
+
+
+@functools.lru_cache(maxsize=4)
+def load_system_prompt(name: str) -> str:
+    """Read one of mlx_video's system prompt files, once per process (raises if missing)."""
+    from mlx_video.models.ltx.enhance_prompt import _load_system_prompt
+
+    return _load_system_prompt(name)
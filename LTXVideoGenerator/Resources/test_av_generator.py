@@ -0,0 +1,159 @@
+import unittest
+import argparse
+import sys
+import os
+import tempfile
+
+# Add the current directory to sys.path to allow importing av_generator
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from av_generator import (
+    _integer,
+    _multiple_of_64,
+    _frame_count,
+    _job_from_item,
+    _run_generation,
+)
+
+
+def _args(**overrides):
+    defaults = dict(
+        prompt=None,
+        height=512,
+        width=512,
+        num_frames=65,
+        seed=42,
+        fps=24,
+        output_path="output.mp4",
+        image=None,
+        image_strength=1.0,
+        tiling="auto",
+        no_audio=False,
+        model_path=None,
+        model_repo="Lightricks/LTX-2",
+        repetition_penalty=1.2,
+        top_p=0.9,
+        pipe=False,
+    )
+    defaults.update(overrides)
+    return argparse.Namespace(**defaults)
+
+
+class TestInteger(unittest.TestCase):
+    def test_valid(self):
+        """Test that ints, integral floats and digit strings are accepted."""
+        self.assertEqual(_integer(7), 7)
+        self.assertEqual(_integer(7.0), 7)
+        self.assertEqual(_integer("-3"), -3)
+
+    def test_invalid(self):
+        """Test that bools, fractional floats and non-numeric strings are rejected."""
+        for value in (True, False, 7.9, "7.9", "seven", None):
+            with self.assertRaises((TypeError, ValueError)):
+                _integer(value)
+
+
+class TestMultipleOf64(unittest.TestCase):
+    def test_valid(self):
+        """Test that positive multiples of 64 are accepted from ints and strings."""
+        self.assertEqual(_multiple_of_64(64), 64)
+        self.assertEqual(_multiple_of_64("768"), 768)
+
+    def test_invalid(self):
+        """Test that zero, negatives and non-multiples are rejected."""
+        for value in (0, -64, 100, "65"):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                _multiple_of_64(value)
+
+
+class TestFrameCount(unittest.TestCase):
+    def test_valid(self):
+        """Test that 8n+1 frame counts are accepted."""
+        for value in (1, 9, 65, "97"):
+            self.assertEqual(_frame_count(value), int(value))
+
+    def test_invalid(self):
+        """Test that counts that are not 8n+1 are rejected."""
+        for value in (0, 8, 64, -7):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                _frame_count(value)
+
+
+class TestJobFromItem(unittest.TestCase):
+    def test_overrides_defaults(self):
+        """Test that request keys override the command-line arguments."""
+        job = _job_from_item(
+            _args(),
+            {"prompt": "a cat", "width": "768", "tiling": "spatial", "no_audio": True},
+            "req",
+        )
+        self.assertEqual(job.prompt, "a cat")
+        self.assertEqual(job.width, 768)
+        self.assertEqual(job.height, 512)
+        self.assertEqual(job.tiling, "spatial")
+        self.assertIs(job.no_audio, True)
+
+    def test_missing_prompt(self):
+        """Test that a request without a prompt (or not an object) is rejected."""
+        for item in ({}, {"prompt": ""}, ["a cat"]):
+            with self.assertRaisesRegex(ValueError, "missing prompt"):
+                _job_from_item(_args(), item, "req")
+
+    def test_unknown_key(self):
+        """Test that keys that are not command-line options are rejected."""
+        with self.assertRaisesRegex(ValueError, "unknown keys"):
+            _job_from_item(_args(), {"prompt": "x", "colour": "red"}, "req")
+
+    def test_invalid_fields(self):
+        """Test that fields are held to the same rules as their command-line options."""
+        for key, value in (
+            ("height", 100),
+            ("num_frames", 64),
+            ("tiling", "bogus"),
+            ("seed", 7.9),
+            ("seed", True),
+            ("fps", "fast"),
+            ("width", 512.5),
+            ("image_strength", "high"),
+            ("image_strength", True),
+            ("no_audio", "yes"),
+        ):
+            with self.subTest(key=key, value=value):
+                with self.assertRaisesRegex(ValueError, f"^req: {key} "):
+                    _job_from_item(_args(), {"prompt": "x", key: value}, "req")
+
+    def test_model_path_must_exist(self):
+        """Test that a model_path override must be an existing directory."""
+        with tempfile.TemporaryDirectory() as model_dir:
+            job = _job_from_item(_args(), {"prompt": "x", "model_path": model_dir}, "req")
+            self.assertEqual(job.model_path, model_dir)
+        with self.assertRaisesRegex(ValueError, "not a directory"):
+            _job_from_item(_args(), {"prompt": "x", "model_path": model_dir}, "req")
+
+
+class TestRunGeneration(unittest.TestCase):
+    def _generate(self, args):
+        calls = []
+        result = _run_generation(lambda **kwargs: calls.append(kwargs), args)
+        self.assertEqual(len(calls), 1)
+        return calls[0], result
+
+    def test_forwards_seed_and_fps(self):
+        """Test that seed and fps reach generate_av and the reported seed matches."""
+        kwargs, result = self._generate(_args(prompt="a cat", seed=7, fps=30))
+        self.assertEqual(kwargs["seed"], 7)
+        self.assertEqual(kwargs["fps"], 30)
+        self.assertEqual(result["seed"], 7)
+
+    def test_request_seed_and_fps_reach_generate_av(self):
+        """Test that validated seed/fps overrides from a JSON request are what generate_av gets."""
+        job = _job_from_item(_args(), {"prompt": "a cat", "seed": 7.0, "fps": "30"}, "req")
+        kwargs, result = self._generate(job)
+        self.assertEqual(kwargs["seed"], 7)
+        self.assertIs(type(kwargs["seed"]), int)
+        self.assertEqual(kwargs["fps"], 30)
+        self.assertEqual(result["seed"], 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+import unittest
+import sys
+import os
+import tempfile
+
+# Add the current directory to sys.path to allow importing av_generator_lora
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    import mlx.core as mx
+    import av_generator_lora
+except (ImportError, SystemExit):  # av_generator_lora exits if mlx_video is missing
+    raise unittest.SkipTest("mlx / mlx_video not installed")
+
+from av_generator_lora import (
+    _SafetensorsReader,
+    _parse_lora_key,
+    _read_lora_groups,
+    _sanitize_lora_key,
+)
+
+
+class TestLoraKeys(unittest.TestCase):
+    def test_parse_lora_key(self):
+        """Test that factor keys split into base name and factor, and alpha keys are skipped."""
+        self.assertEqual(
+            _parse_lora_key("blocks.0.attn1.to_out.0.lora_A.weight"),
+            ("blocks.0.attn1.to_out.0", "down"),
+        )
+        self.assertEqual(
+            _parse_lora_key("blocks.0.ff.net.2.lora_up.weight"),
+            ("blocks.0.ff.net.2", "up"),
+        )
+        self.assertIsNone(_parse_lora_key("blocks.0.attn1.to_q.alpha"))
+        self.assertIsNone(_parse_lora_key("blocks.0.attn1.to_q.weight"))
+
+    def test_sanitize_strips_prefixes(self):
+        """Test that the diffusers/ComfyUI prefixes are removed."""
+        self.assertEqual(
+            _sanitize_lora_key("model.diffusion_model.transformer_blocks.0.attn1.to_q"),
+            "transformer_blocks.0.attn1.to_q",
+        )
+        self.assertEqual(
+            _sanitize_lora_key("transformer.transformer_blocks.0.attn1.to_q"),
+            "transformer_blocks.0.attn1.to_q",
+        )
+
+    def test_sanitize_maps_final_segment(self):
+        """Test that rules apply at the end of a base name, which has no trailing dot."""
+        cases = {
+            "transformer_blocks.0.attn1.to_out.0": "transformer_blocks.0.attn1.to_out",
+            "transformer_blocks.0.ff.net.0.proj": "transformer_blocks.0.ff.proj_in",
+            "transformer_blocks.0.ff.net.2": "transformer_blocks.0.ff.proj_out",
+            "transformer_blocks.0.audio_ff.net.0.proj": "transformer_blocks.0.audio_ff.proj_in",
+            "transformer_blocks.0.audio_ff.net.2": "transformer_blocks.0.audio_ff.proj_out",
+            "adaln_single.emb.timestep_embedder.linear_1": "adaln_single.emb.timestep_embedder.linear1",
+        }
+        for key, expected in cases.items():
+            self.assertEqual(_sanitize_lora_key(key), expected, key)
+
+    def test_sanitize_respects_segment_boundaries(self):
+        """Test that rules do not fire inside a longer segment name."""
+        self.assertEqual(
+            _sanitize_lora_key("blocks.0.attn1.to_out.01"), "blocks.0.attn1.to_out.01"
+        )
+        self.assertEqual(_sanitize_lora_key("blocks.0.linear_10"), "blocks.0.linear_10")
+
+
+class TestSafetensorsReader(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".safetensors")
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_round_trips_mx_save_safetensors(self):
+        """Test that every dtype mx.save_safetensors writes is read back unchanged."""
+        tensors = {
+            "f32": mx.arange(6, dtype=mx.float32).reshape(2, 3),
+            "f16": mx.array([0.5, -1.25], dtype=mx.float16),
+            "bf16": mx.array([[1.5, -2.0], [3.0, 0.125]], dtype=mx.bfloat16),
+            "i64": mx.array([1, -2], dtype=mx.int64),
+            "i32": mx.array([3, -4], dtype=mx.int32),
+            "i16": mx.array([5, -6], dtype=mx.int16),
+            "i8": mx.array([7, -8], dtype=mx.int8),
+            "u8": mx.array([9, 255], dtype=mx.uint8),
+            "u32": mx.array([10, 11], dtype=mx.uint32),
+            "bool": mx.array([True, False]),
+            "scalar": mx.array(4.0),
+        }
+        mx.save_safetensors(self.path, tensors)
+        with _SafetensorsReader(self.path) as reader:
+            self.assertEqual(set(reader.keys()), set(tensors))
+            for key, expected in tensors.items():
+                got = reader.get_tensor(key)
+                self.assertEqual(got.dtype, expected.dtype, key)
+                self.assertEqual(got.shape, expected.shape, key)
+                self.assertTrue(mx.array_equal(got, expected).item(), key)
+
+    def test_float64_is_narrowed_to_float32(self):
+        """Test that an F64 tensor (e.g. a LoRA alpha saved by numpy/torch) loads as float32."""
+        import numpy as np
+
+        header = b'{"alpha":{"dtype":"F64","shape":[],"data_offsets":[0,8]}}'
+        with open(self.path, "wb") as f:
+            f.write(len(header).to_bytes(8, "little") + header)
+            f.write(np.array(16.0, dtype=np.float64).tobytes())
+        with _SafetensorsReader(self.path) as reader:
+            alpha = reader.get_tensor("alpha")
+        self.assertEqual(alpha.dtype, mx.float32)
+        self.assertEqual(alpha.item(), 16.0)
+
+    def test_unreadable_lora_is_skipped(self):
+        """Test that a tensor the reader cannot decode skips the LoRA instead of raising."""
+        base = "transformer_blocks.0.attn1.to_q"
+        header = (
+            b'{"' + base.encode() + b'.lora_A.weight":'
+            b'{"dtype":"F8_E4M3","shape":[1],"data_offsets":[0,1]},'
+            b'"' + base.encode() + b'.lora_B.weight":'
+            b'{"dtype":"F8_E4M3","shape":[1],"data_offsets":[1,2]}}'
+        )
+        with open(self.path, "wb") as f:
+            f.write(len(header).to_bytes(8, "little") + header + b"\x00\x00")
+        with self.assertRaises(ValueError):
+            _read_lora_groups(self.path)
+        # The model is never touched when the file cannot be read
+        av_generator_lora.apply_lora_weights(None, self.path, strength=1.0)
+
+    def test_read_lora_groups(self):
+        """Test that factors and alpha are grouped under the mlx module name."""
+        base = "transformer.transformer_blocks.0.attn1.to_q"
+        mx.save_safetensors(
+            self.path,
+            {
+                f"{base}.lora_A.weight": mx.zeros((4, 8)),
+                f"{base}.lora_B.weight": mx.zeros((16, 4)),
+                f"{base}.alpha": mx.array(2.0),
+                "unrelated.weight": mx.zeros((2,)),
+            },
+        )
+        groups = _read_lora_groups(self.path)
+        self.assertEqual(list(groups), ["transformer_blocks.0.attn1.to_q"])
+        group = groups["transformer_blocks.0.attn1.to_q"]
+        self.assertEqual(group["down"].shape, (4, 8))
+        self.assertEqual(group["up"].shape, (16, 4))
+        self.assertEqual(group["alpha"].item(), 2.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
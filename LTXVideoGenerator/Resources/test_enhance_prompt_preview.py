@@ -6,7 +6,7 @@ import os
 # Add the current directory to sys.path to allow importing enhance_prompt_preview
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from enhance_prompt_preview import _clean_response
+from enhance_prompt_preview import _clean_response, _integer
 
 class TestCleanResponse(unittest.TestCase):
     def test_normal_string(self):
@@ -53,5 +53,19 @@ class TestCleanResponse(unittest.TestCase):
         # " ...   " -> strip() -> "..." -> re.sub -> ""
         self.assertEqual(_clean_response(" ...   "), "")
 
+class TestInteger(unittest.TestCase):
+    def test_valid(self):
+        """Test that ints, integral floats and digit strings are accepted."""
+        self.assertEqual(_integer(7), 7)
+        self.assertEqual(_integer(7.0), 7)
+        self.assertEqual(_integer("42"), 42)
+
+    def test_invalid(self):
+        """Test that bools and fractional floats are rejected instead of truncated."""
+        for value in (True, 7.9, "7.9", None):
+            with self.assertRaises((TypeError, ValueError)):
+                _integer(value)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,5 @@
+"""ffmpeg encoder settings shared by the AV generator scripts."""
+
+# H.264 on the Apple media engine. h264_videotoolbox has no quality-based
+# default: without an explicit rate ffmpeg falls back to ~200 kb/s
+H264_VIDEOTOOLBOX_ARGS = ["-c:v", "h264_videotoolbox", "-b:v", "8M"]